@@ -8,6 +8,7 @@ from typing import Optional
 import ccxt.pro as ccxtpro
 
 from config import parse_config
+from orderbook import LocalOrderBook, contract_size_of, executable_spread
 
 # 全局日志变量
 logger = None
@@ -62,6 +63,19 @@ class ArbitrageBot:
             for exchange in [self.exchange1, self.exchange2]:
                 exchange.http_proxy = proxy_url
                 exchange.ws_proxy = proxy_url
+        
+        # 本地有限深度订单簿，需要加载市场信息后才能确定合约面值
+        self.book1 = None
+        self.book2 = None
+    
+    async def init_books(self):
+        """加载市场信息并按合约面值初始化本地订单簿"""
+        await self.exchange1.load_markets()
+        await self.exchange2.load_markets()
+        market1 = self.exchange1.market(self.config.market1.name)
+        market2 = self.exchange2.market(self.config.market2.name)
+        self.book1 = LocalOrderBook(self.config.depth, contract_size_of(market1))
+        self.book2 = LocalOrderBook(self.config.depth, contract_size_of(market2))
     
     async def watch_orderbooks(self):
         while True:
@@ -69,12 +83,14 @@ class ArbitrageBot:
                 # 获取两个市场的订单簿
                 orderbook1 = await self.exchange1.watch_order_book(self.config.market1.name)
                 orderbook2 = await self.exchange2.watch_order_book(self.config.market2.name)
+                self.book1.update_from_snapshot(orderbook1)
+                self.book2.update_from_snapshot(orderbook2)
                 
                 # 获取价格
-                ask1 = orderbook1['asks'][0][0] if len(orderbook1['asks']) > 0 else None
-                bid1 = orderbook1['bids'][0][0] if len(orderbook1['bids']) > 0 else None
-                ask2 = orderbook2['asks'][0][0] if len(orderbook2['asks']) > 0 else None
-                bid2 = orderbook2['bids'][0][0] if len(orderbook2['bids']) > 0 else None
+                ask1 = self.book1.asks.best()
+                bid1 = self.book1.bids.best()
+                ask2 = self.book2.asks.best()
+                bid2 = self.book2.bids.best()
                 
                 # 计算正向和反向价差
                 if self.config.market1.direction == '+' and self.config.market2.direction == '-':
@@ -85,6 +101,10 @@ class ArbitrageBot:
                     # 反向价差：market1(卖方bid) - market2(买方ask)
                     reverse_spread = (bid1 - ask2) / ((bid1 + ask2) / 2) * 100 if (bid1 and ask2) else None
                     reverse_direction = f"+{self.config.market2.exchange}({self.config.market2.name})-{self.config.market1.exchange}({self.config.market1.name})"
+                    
+                    # 按 perSize 下单数量计算 VWAP 可执行价差
+                    forward_exec, forward_fill = executable_spread(self.book1.asks, self.book2.bids, self.config.perSize)
+                    reverse_exec, reverse_fill = executable_spread(self.book2.asks, self.book1.bids, self.config.perSize)
                 else:
                     # 正向价差：market1(卖方bid) - market2(买方ask)
                     forward_spread = (bid1 - ask2) / ((bid1 + ask2) / 2) * 100 if (bid1 and ask2) else None
@@ -93,6 +113,10 @@ class ArbitrageBot:
                     # 反向价差：market2(卖方bid) - market1(买方ask)
                     reverse_spread = (bid2 - ask1) / ((bid2 + ask1) / 2) * 100 if (bid2 and ask1) else None
                     reverse_direction = f"+{self.config.market1.exchange}({self.config.market1.name})-{self.config.market2.exchange}({self.config.market2.name})"
+                    
+                    # 按 perSize 下单数量计算 VWAP 可执行价差
+                    forward_exec, forward_fill = executable_spread(self.book2.asks, self.book1.bids, self.config.perSize)
+                    reverse_exec, reverse_fill = executable_spread(self.book1.asks, self.book2.bids, self.config.perSize)
                 
                 # 输出价格信息
                 logger.info(f"{self.config.market1.exchange} {self.config.market1.name} - "
@@ -104,13 +128,22 @@ class ArbitrageBot:
                 logger.info(f"正向价差 ({forward_direction}): {forward_spread:.4f}% (阈值: {float(self.config.priceDiff)*100}%)")
                 logger.info(f"反向价差 ({reverse_direction}): {reverse_spread:.4f}% (阈值: {float(self.config.priceDiff)*100}%)")
                 
-                # 检查正向价差是否超过阈值
-                if forward_spread and abs(forward_spread) > float(self.config.priceDiff) * 100:
-                    logger.warning(f"发现正向套利机会！{forward_direction} 价差 {forward_spread:.4f}% 超过阈值")
+                # 输出可执行价差，深度不足 perSize 时标注实际可成交数量
+                for name, spread, filled in (('正向', forward_exec, forward_fill), ('反向', reverse_exec, reverse_fill)):
+                    if spread is None:
+                        continue
+                    suffix = '' if filled >= self.config.perSize else f" (深度不足，仅可成交 {filled})"
+                    logger.info(f"{name}可执行价差 @{self.config.perSize}: {spread:.4f}%{suffix}")
+                
+                # 检查正向可执行价差是否超过阈值，深度不足 perSize 时不提示
+                if (forward_exec and forward_fill >= self.config.perSize
+                        and abs(forward_exec) > float(self.config.priceDiff) * 100):
+                    logger.warning(f"发现正向套利机会！{forward_direction} 可执行价差 {forward_exec:.4f}% 超过阈值")
                 
-                # 检查反向价差是否超过阈值
-                if reverse_spread and abs(reverse_spread) > float(self.config.priceDiff) * 100:
-                    logger.warning(f"发现反向套利机会！{reverse_direction} 价差 {reverse_spread:.4f}% 超过阈值")
+                # 检查反向可执行价差是否超过阈值，深度不足 perSize 时不提示
+                if (reverse_exec and reverse_fill >= self.config.perSize
+                        and abs(reverse_exec) > float(self.config.priceDiff) * 100):
+                    logger.warning(f"发现反向套利机会！{reverse_direction} 可执行价差 {reverse_exec:.4f}% 超过阈值")
                 
             except Exception as e:
                 logger.error(f"发生错误: {str(e)}")
@@ -118,6 +151,7 @@ class ArbitrageBot:
     
     async def run(self):
         try:
+            await self.init_books()
             await self.watch_orderbooks()
         except asyncio.CancelledError:
             logger.info("任务被取消")
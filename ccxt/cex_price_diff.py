@@ -8,6 +8,9 @@ from typing import Dict, List, Optional
 
 import ccxt
 
+from orderbook import LocalOrderBook, contract_size_of, executable_spread
+from snapshot_export import SnapshotExporter
+
 # 在文件开头添加颜色常量
 GREEN = '\033[32m'
 RESET = '\033[0m'
@@ -175,6 +178,17 @@ class ExchangeManager:
                     prices[base]['askVolume'] = float(ticker['info']['lowest_size'])
         return prices
 
+    def fetch_order_book(self, exchange_id: str, symbol: str, depth: int) -> Optional[LocalOrderBook]:
+        """获取指定交易对的有限深度订单簿"""
+        try:
+            orderbook = self.exchanges[exchange_id].fetch_order_book(symbol, depth)
+        except Exception as e:
+            logger.error(f"获取{exchange_id} {symbol}订单簿失败: {str(e)}")
+            return None
+        book = LocalOrderBook(depth, contract_size_of(self.markets[exchange_id][symbol]))
+        book.update_from_snapshot(orderbook)
+        return book
+
     def calculate_fees(self, market1: str, market2: str) -> float:
         """计算套利手续费"""
         market1_fee = fees[market1]['taker']
@@ -291,13 +305,59 @@ def process_market_pair_diff(market_k, market_l, base, processed_pairs, all_diff
     all_diffs.append(diff_info)
     processed_pairs.add(pair_name)
 
+def apply_depth_sampling(manager, candidates, notional, depth=20):
+    """对候选价差拉取订单簿深度，用 VWAP 可执行价差和可成交额替换盘口数据
+
+    只返回采样成功的候选，订单簿获取失败或无深度的候选被丢弃，
+    避免盘口价差与 VWAP 价差混在一起排序；前 depth 档凑不满目标成交额的候选
+    标记为 depth_partial
+    """
+    requests = set()
+    for diff_info in candidates:
+        requests.add((diff_info['market1'].split(':')[0].lower(), diff_info['symbols']['market1']))
+        requests.add((diff_info['market2'].split(':')[0].lower(), diff_info['symbols']['market2']))
+
+    books = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+        futures = {
+            executor.submit(manager.fetch_order_book, exchange_id, symbol, depth): (exchange_id, symbol)
+            for exchange_id, symbol in requests
+        }
+        for future in concurrent.futures.as_completed(futures):
+            books[futures[future]] = future.result()
+
+    sampled = []
+    for diff_info in candidates:
+        book1 = books.get((diff_info['market1'].split(':')[0].lower(), diff_info['symbols']['market1']))
+        book2 = books.get((diff_info['market2'].split(':')[0].lower(), diff_info['symbols']['market2']))
+        if book1 is None or book2 is None:
+            continue
+
+        best_ask = book1.asks.best()
+        if not best_ask:
+            continue
+        # 按最优卖价把目标成交额换算成基础币数量，两边按同一数量计算 VWAP
+        target = notional / best_ask
+        spread, filled = executable_spread(book1.asks, book2.bids, target)
+        if spread is None:
+            continue
+        diff_info['top_diff'] = diff_info['diff']
+        diff_info['top_value_usdt'] = diff_info['tradeable_value_usdt']
+        diff_info['diff'] = spread
+        diff_info['tradeable_value_usdt'] = filled * book1.asks.vwap(filled)
+        diff_info['depth_sampled'] = True
+        diff_info['depth_partial'] = filled < target
+        sampled.append(diff_info)
+
+    return sampled
+
 def display_results(manager, top_diffs, exchange_data, current_time):
     """显示结果"""
     print('\033[2J\033[H', end='')
     print(f"Top 10 Price Differences - {current_time}")
     print("-" * 220)
     print(f"{'Symbol':<10} {'Market1':<15} {'Bid1/Ask1':<25} {'Market2':<15} {'Bid2/Ask2':<25} "
-          f"{'MaxDiff':<12} {'Volume(USDT)':<15} {'Fees':<10} {'Net Profit':<12}")
+          f"{'MaxDiff':<12} {'Volume(USDT)':<15} {'Fees':<10} {'Net Profit':<12} {'Source':<6}")
     print("-" * 220)
 
     for diff_info in top_diffs:
@@ -313,6 +373,13 @@ def display_results(manager, top_diffs, exchange_data, current_time):
         net_profit = diff_info['diff'] - total_fees
         volume_usdt = diff_info['tradeable_value_usdt']
         profit_color = GREEN if net_profit > 0 else '\033[31m'
+        # VWAP: 按订单簿深度采样，PART: 深度不足目标成交额，TOB: 仅盘口数据
+        if diff_info.get('depth_partial'):
+            source = 'PART'
+        elif diff_info.get('depth_sampled'):
+            source = 'VWAP'
+        else:
+            source = 'TOB'
 
         print(f"{diff_info['base']:<10} "
               f"{diff_info['market1']:<15} "
@@ -322,20 +389,50 @@ def display_results(manager, top_diffs, exchange_data, current_time):
               f"{profit_color}{diff_info['diff']:>7.4f}%{RESET} "
               f"${volume_usdt:<14,.2f} "
               f"{total_fees:>7.4f}% "
-              f"{profit_color}{net_profit:>7.4f}%{RESET}")
+              f"{profit_color}{net_profit:>7.4f}%{RESET} "
+              f"{source:<6}")
+
+def positive_int(value: str) -> int:
+    """argparse 参数类型：大于 0 的整数"""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+    return number
 
 def get_exchange_price_diff():
     """主函数"""
+    exporter = None
     try:
         # 添加命令行参数解析
         parser = argparse.ArgumentParser(description='交易所价差监控工具')
         parser.add_argument('-p', '--proxy', 
                           help='代理服务器地址，例如：http://127.0.0.1:7897',
                           default=None)
+        parser.add_argument('--depth-top',
+                          help='对价差最大的前 N 个候选拉取订单簿深度计算可执行价差，0 表示关闭',
+                          type=int,
+                          default=0)
+        parser.add_argument('--depth-notional',
+                          help='深度采样时的目标成交额(USDT)',
+                          type=float,
+                          default=1000)
+        parser.add_argument('--depth-levels',
+                          help='深度采样时拉取的订单簿档位数',
+                          type=positive_int,
+                          default=20)
+        parser.add_argument('--export',
+                          help='快照导出目录，每轮扫描的价格表和价差表以 Parquet 格式追加写入（需要 pyarrow）',
+                          default=None)
+        parser.add_argument('--export-rotate',
+                          help='快照文件分段间隔(秒)，每段结束后文件才可读取',
+                          type=positive_int,
+                          default=300)
         args = parser.parse_args()
         
         # 使用可选的代理地址初始化 ExchangeManager
         manager = ExchangeManager(args.proxy)
+        if args.export:
+            exporter = SnapshotExporter(args.export, rotate_seconds=args.export_rotate)
         max_retries = 3
 
         while True:
@@ -373,7 +470,23 @@ def get_exchange_price_diff():
                             )
 
                     # 处理结果
-                    top_diffs = sorted(all_diffs, key=lambda x: x['diff'], reverse=True)[:10]
+                    top_diffs = sorted(all_diffs, key=lambda x: x['diff'], reverse=True)
+                    if args.depth_top > 0:
+                        # 前 N 个候选换成 VWAP 数据，排在未经深度校验的盘口数据之前，
+                        # 深度不足目标成交额的排在能完整成交的之后
+                        sampled = apply_depth_sampling(manager, top_diffs[:args.depth_top],
+                                                       args.depth_notional, args.depth_levels)
+                        top_diffs = sorted(sampled + top_diffs[args.depth_top:],
+                                           key=lambda x: (x.get('depth_sampled', False),
+                                                          not x.get('depth_partial', False),
+                                                          x['diff']),
+                                           reverse=True)
+
+                    # 导出本轮快照（含深度采样结果），写入在后台线程完成
+                    if exporter:
+                        exporter.submit(time.time(), exchange_data, all_diffs)
+
+                    top_diffs = top_diffs[:10]
                     
                     # 为相同币种添加标识
                     symbol_count = {}
@@ -401,6 +514,8 @@ def get_exchange_price_diff():
     except KeyboardInterrupt:
         logger.info("正在退出程序...")
     finally:
+        if exporter:
+            exporter.close()
         logger.info("程序已退出")
 
 if __name__ == "__main__":
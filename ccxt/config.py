@@ -19,6 +19,7 @@ class ArbitrageConfig:
     market1: MarketConfig
     market2: MarketConfig
     stop: bool
+    depth: int = 20
 
 def parse_config(config_path: str) -> ArbitrageConfig:
     """解析YAML配置文件为配置对象
@@ -45,5 +46,6 @@ def parse_config(config_path: str) -> ArbitrageConfig:
         priceDiff=config_dict['priceDiff'],
         market1=market1,
         market2=market2,
-        stop=config_dict['stop']
+        stop=config_dict['stop'],
+        depth=int(config_dict.get('depth', 20))
     )
\ No newline at end of file
@@ -0,0 +1,96 @@
+from typing import List, Optional, Sequence, Tuple
+
+
+class BookSide:
+    """单边订单簿，只保留前 depth 档
+
+    价格和数量分别存放在两个平行列表中，下标 0 始终是最优价。
+    ccxt.pro 已经在内部增量维护完整订单簿，这里每次只从中截取前 depth 档。
+    """
+
+    def __init__(self, depth: int = 20):
+        self.depth = depth
+        self.prices: List[float] = []
+        self.amounts: List[float] = []
+
+    def __len__(self):
+        return len(self.prices)
+
+    def replace(self, levels: Sequence[Sequence[float]], contract_size: float = 1.0):
+        """用快照覆盖整边，只保留前 depth 档（levels 需已按最优价排序）
+
+        合约市场 ccxt 返回的数量是张数，乘以 contract_size 换算成基础币数量
+        """
+        levels = levels[:self.depth]
+        self.prices = [level[0] for level in levels]
+        self.amounts = [level[1] * contract_size for level in levels]
+
+    def best(self) -> Optional[float]:
+        return self.prices[0] if self.prices else None
+
+    def available(self, amount: float) -> float:
+        """在已有深度内最多能成交的数量(基础币)，不超过 amount"""
+        filled = 0.0
+        for level_amount in self.amounts:
+            filled += level_amount
+            if filled >= amount:
+                return amount
+        return filled
+
+    def vwap(self, amount: float) -> Optional[float]:
+        """吃掉 amount 数量(基础币)的成交均价，只遍历实际触及的价位
+
+        深度不足时按已有深度计算，一档都没有时返回 None
+        """
+        filled = 0.0
+        cost = 0.0
+        for price, level_amount in zip(self.prices, self.amounts):
+            take = min(level_amount, amount - filled)
+            filled += take
+            cost += take * price
+            if filled >= amount:
+                break
+
+        if filled <= 0:
+            return None
+        return cost / filled
+
+
+class LocalOrderBook:
+    """本地维护的有限深度订单簿"""
+
+    def __init__(self, depth: int = 20, contract_size: float = 1.0):
+        self.depth = depth
+        # 每张合约对应的基础币数量，现货为 1
+        self.contract_size = contract_size
+        self.asks = BookSide(depth)
+        self.bids = BookSide(depth)
+
+    def update_from_snapshot(self, orderbook: dict):
+        """用 ccxt 返回的订单簿快照刷新本地订单簿"""
+        self.asks.replace(orderbook['asks'], self.contract_size)
+        self.bids.replace(orderbook['bids'], self.contract_size)
+
+
+def contract_size_of(market: dict) -> float:
+    """从 ccxt 市场信息中取合约面值，现货或未提供时为 1"""
+    return float(market.get('contractSize') or 1)
+
+
+def executable_spread(ask_side: BookSide, bid_side: BookSide,
+                      amount: float) -> Tuple[Optional[float], float]:
+    """计算在 ask_side 买入、在 bid_side 卖出 amount 数量(基础币)时的可执行价差
+
+    两边按同一成交量计算 VWAP：先找出两边都能成交的数量，再分别求均价。
+
+    Returns:
+        (基于 VWAP 的价差百分比, 两边都能成交的数量)，任一边无深度时价差为 None
+    """
+    filled = min(ask_side.available(amount), bid_side.available(amount))
+    if filled <= 0:
+        return None, 0.0
+
+    ask_vwap = ask_side.vwap(filled)
+    bid_vwap = bid_side.vwap(filled)
+    spread = (bid_vwap - ask_vwap) / ((bid_vwap + ask_vwap) / 2) * 100
+    return spread, filled
@@ -0,0 +1,302 @@
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # 导出为可选功能，未启用时不要求安装 pyarrow
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# 文件名中的时间格式(UTC)，文件名为 {首行时间}_{分段结束时间}_{进程号}.parquet
+FILE_TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+PRICE_FIELDS = [
+    ('ts', 'timestamp'),
+    ('exchange', 'string'),
+    ('market_type', 'string'),
+    ('base', 'string'),
+    ('symbol', 'string'),
+    ('price', 'float'),
+    ('bid', 'float'),
+    ('ask', 'float'),
+    ('bid_volume', 'float'),
+    ('ask_volume', 'float'),
+    ('base_volume', 'float'),
+]
+
+SPREAD_FIELDS = [
+    ('ts', 'timestamp'),
+    ('base', 'string'),
+    ('market1', 'string'),
+    ('market2', 'string'),
+    ('symbol1', 'string'),
+    ('symbol2', 'string'),
+    ('ask_price', 'float'),
+    ('bid_price', 'float'),
+    ('ask_volume', 'float'),
+    ('bid_volume', 'float'),
+    # 盘口价差和盘口可成交额
+    ('top_diff', 'float'),
+    ('top_value_usdt', 'float'),
+    # 深度采样得到的 VWAP 可执行价差和可成交额，未采样时为空
+    ('vwap_diff', 'float'),
+    ('vwap_value_usdt', 'float'),
+]
+
+TABLES = {'prices': PRICE_FIELDS, 'spreads': SPREAD_FIELDS}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("快照导出需要 pyarrow，请先执行: pip install pyarrow")
+
+
+def _schema(fields) -> 'pa.Schema':
+    types = {
+        'timestamp': pa.timestamp('ms', tz='UTC'),
+        # 交易所、币种等重复值多，用字典编码压缩
+        'string': pa.dictionary(pa.int32(), pa.string()),
+        'float': pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in fields])
+
+
+def _price_rows(ts_ms: int, exchange_data: Dict) -> List[tuple]:
+    rows = []
+    for exchange_id, markets in exchange_data.items():
+        for market_type, prices in markets.items():
+            for base, data in prices.items():
+                rows.append((
+                    ts_ms, exchange_id, market_type, base, data['symbol'],
+                    data['price'], data['bid'], data['ask'],
+                    data['bidVolume'], data['askVolume'], data['baseVolume'],
+                ))
+    return rows
+
+
+def _spread_rows(ts_ms: int, all_diffs: Sequence[Dict]) -> List[tuple]:
+    rows = []
+    for d in all_diffs:
+        # 深度采样后 diff/tradeable_value_usdt 是 VWAP 数据，盘口数据保存在 top_* 中
+        sampled = d.get('depth_sampled', False)
+        rows.append((
+            ts_ms, d['base'], d['market1'], d['market2'],
+            d['symbols']['market1'], d['symbols']['market2'],
+            d['ask_price'], d['bid_price'], d['ask_volume'], d['bid_volume'],
+            d['top_diff'] if sampled else d['diff'],
+            d['top_value_usdt'] if sampled else d['tradeable_value_usdt'],
+            d['diff'] if sampled else None,
+            d['tradeable_value_usdt'] if sampled else None,
+        ))
+    return rows
+
+
+class _TableWriter:
+    """单张表的 Parquet 写入器，每次 flush 写出一个 row group，按时间分段写文件
+
+    Parquet 只有写完 footer 才能读取，所以每个分段结束就关闭文件，
+    异常退出时最多丢失当前分段的数据。
+    """
+
+    def __init__(self, out_dir: str, name: str, fields):
+        self.dir = os.path.join(out_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.fields = fields
+        self.schema = _schema(fields)
+        self.rows: List[tuple] = []
+        self.writer = None
+        self.path = None
+
+    def flush(self):
+        if not self.rows:
+            return
+        # 先取出缓冲区，写入失败（如磁盘已满）时丢弃这一批，避免缓冲区无限增长
+        rows, self.rows = self.rows, []
+        try:
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array(column, type=self.schema.field(i).type)
+                for i, column in enumerate(columns)
+            ]
+            self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        except Exception as e:
+            logger.error(f"写入快照失败，丢弃 {len(rows)} 行: {self.path}.tmp: {str(e)}")
+
+    def open(self, start: float, end: float):
+        start_name = datetime.fromtimestamp(start, tz=timezone.utc).strftime(FILE_TIME_FORMAT)
+        end_name = datetime.fromtimestamp(end, tz=timezone.utc).strftime(FILE_TIME_FORMAT)
+        # 带上进程号，重启或多个进程同时导出时不会覆盖已有文件
+        self.path = os.path.join(self.dir, f'{start_name}_{end_name}_{os.getpid()}.parquet')
+        # 写入过程中使用临时文件名，关闭后再改名，读取方只会看到完整文件
+        self.writer = pq.ParquetWriter(self.path + '.tmp', self.schema, compression='zstd')
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        # 关闭失败时也不再复用这个 writer，下一段重新打开文件
+        writer, self.writer = self.writer, None
+        writer.close()
+        if os.path.exists(self.path):
+            logger.error(f"快照文件已存在，保留临时文件: {self.path}.tmp")
+            return
+        os.rename(self.path + '.tmp', self.path)
+
+
+class SnapshotExporter:
+    """后台线程批量写出每轮扫描的价格表和价差表
+
+    扫描线程只负责把数据放入队列，转换和磁盘写入都在写线程中完成；
+    队列满时丢弃本轮快照，不会阻塞扫描循环。
+    """
+
+    def __init__(self, out_dir: str, rotate_seconds: int = 300,
+                 flush_seconds: float = 60, batch_rows: int = 100000,
+                 max_pending: int = 64):
+        _require_pyarrow()
+        if rotate_seconds <= 0:
+            raise ValueError(f"rotate_seconds 必须大于 0: {rotate_seconds}")
+        self.out_dir = out_dir
+        self.rotate_seconds = rotate_seconds
+        self.flush_seconds = flush_seconds
+        self.batch_rows = batch_rows
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.tables = {name: _TableWriter(out_dir, name, fields) for name, fields in TABLES.items()}
+        self.period = None
+        self.thread = threading.Thread(target=self._run, name='snapshot-exporter', daemon=True)
+        self.thread.start()
+
+    def submit(self, ts: float, exchange_data: Dict, all_diffs: Sequence[Dict]):
+        """提交一轮扫描结果
+
+        exchange_data 每轮重新生成，可以直接交给写线程；all_diffs 中的字典之后
+        会被修改（币种标识），所以这里先拷贝成元组。应在深度采样之后调用。
+        """
+        ts_ms = int(ts * 1000)
+        spreads = _spread_rows(ts_ms, all_diffs)
+        try:
+            self.queue.put_nowait((ts, ts_ms, exchange_data, spreads))
+        except queue.Full:
+            logger.warning("快照导出队列已满，丢弃本轮数据")
+
+    def close(self):
+        """写出剩余数据并关闭文件"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _close_expired(self, ts: float):
+        """当前分段已结束时关闭文件，使其可以被读取"""
+        if self.period is None or int(ts // self.rotate_seconds) == self.period:
+            return
+        for table in self.tables.values():
+            table.close()
+        self.period = None
+
+    def _rotate(self, ts: float):
+        self._close_expired(ts)
+        if self.period is not None:
+            return
+        period = int(ts // self.rotate_seconds)
+        for table in self.tables.values():
+            table.open(ts, (period + 1) * self.rotate_seconds)
+        self.period = period
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                item = ()
+
+            if item is None:
+                break
+
+            try:
+                if item:
+                    ts, ts_ms, exchange_data, spreads = item
+                    self._rotate(ts)
+                    self.tables['prices'].rows.extend(_price_rows(ts_ms, exchange_data))
+                    self.tables['spreads'].rows.extend(spreads)
+                else:
+                    # 长时间没有新数据时也要按时关闭分段
+                    self._close_expired(time.time())
+
+                now = time.monotonic()
+                if now - last_flush >= self.flush_seconds:
+                    for table in self.tables.values():
+                        if table.writer is not None:
+                            table.flush()
+                    last_flush = now
+                else:
+                    for table in self.tables.values():
+                        if len(table.rows) >= self.batch_rows:
+                            table.flush()
+            except Exception as e:
+                logger.error(f"快照导出失败: {str(e)}", exc_info=True)
+
+        for table in self.tables.values():
+            try:
+                table.close()
+            except Exception as e:
+                logger.error(f"关闭快照文件失败: {str(e)}", exc_info=True)
+
+
+def load_snapshots(out_dir: str, table: str = 'spreads',
+                   columns: Optional[List[str]] = None,
+                   start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> 'pa.Table':
+    """读取导出的历史快照
+
+    Args:
+        out_dir: 导出目录
+        table: 'prices' 或 'spreads'
+        columns: 只读取的列，None 表示全部
+        start: 起始时间(含)，无时区时按 UTC 处理
+        end: 结束时间(不含)，无时区时按 UTC 处理
+
+    Returns:
+        pyarrow.Table: 可以用 to_pandas() 转换
+    """
+    _require_pyarrow()
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    # 按文件名中的时间范围裁剪，避免打开范围之外的文件；未关闭的 .tmp 文件没有 footer，不读取
+    files = []
+    for path in sorted(glob.glob(os.path.join(out_dir, table, '*.parquet'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        start_name, end_name, _ = name.split('_')
+        file_start = datetime.strptime(start_name, FILE_TIME_FORMAT).replace(tzinfo=timezone.utc)
+        file_end = datetime.strptime(end_name, FILE_TIME_FORMAT).replace(tzinfo=timezone.utc)
+        if end is not None and file_start >= end:
+            continue
+        if start is not None and file_end <= start:
+            continue
+        files.append(path)
+
+    schema = _schema(TABLES[table])
+    if not files:
+        return schema.empty_table().select(columns) if columns else schema.empty_table()
+
+    ts_type = schema.field('ts').type
+    condition = None
+    if start is not None:
+        condition = ds.field('ts') >= pa.scalar(start, type=ts_type)
+    if end is not None:
+        end_condition = ds.field('ts') < pa.scalar(end, type=ts_type)
+        condition = end_condition if condition is None else condition & end_condition
+
+    dataset = ds.dataset(files, schema=schema, format='parquet')
+    return dataset.to_table(columns=columns, filter=condition)